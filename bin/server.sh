@@ -1 +0,0 @@
-#!/bin/sh
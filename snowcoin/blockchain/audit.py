@@ -0,0 +1,131 @@
+"""
+Re-verify the stored main chain without replaying it.
+
+Workers check ranges of heights on their own: every block is present, its
+hash matches both its content and the hash it is stored under, it links to
+the block before it, and its inputs are signed by the owners of the outputs
+they spend. The hardness every block had to satisfy is then rebuilt from
+the timestamps the workers sent back.
+"""
+import multiprocessing as mp
+from collections import deque, namedtuple
+from typing import Iterator, List
+from .block import Block, GENSIS_HASH, MAX_HARDNESS, hash_value
+from .chain import BlockChain, HARDNESS_WINDOW, TARGET_TIME, block_key
+from ..encryption.keys import key2address
+from ..encryption.signature import verify
+
+
+SHARD_SIZE = 1000
+
+
+AuditIssue = namedtuple('AuditIssue', ['height', 'block_hash', 'message'])
+
+
+def _audit_shard(shard):
+    """
+    Check heights ``start`` to ``start + len(hashes) - 1``; ``parent`` is the hash before ``start``.
+    """
+    start, parent, hashes = shard
+    blockchain = BlockChain()
+    redis = blockchain._redis
+    issues = []
+    timestamps = []
+    for height, (block_hash, raw) in enumerate(zip(hashes, redis.mget([block_key(h) for h in hashes])), start):
+        if raw is None:
+            issues.append(AuditIssue(height, block_hash, "missing"))
+            timestamps.append(None)
+            parent = block_hash
+            continue
+        try:
+            block = Block.deserialize(raw)
+        except Exception as e:
+            # Damaged data fails in whatever way the serializer hits it, struct.error included.
+            issues.append(AuditIssue(height, block_hash, "cannot be decoded: {!r}".format(e)))
+            timestamps.append(None)
+            parent = block_hash
+            continue
+        timestamps.append(block.timestamp)
+        if block.hash != block_hash:
+            issues.append(AuditIssue(height, block_hash, "stored under another hash"))
+        if parent is not None and block.parent != parent:
+            issues.append(AuditIssue(height, block_hash, "parent is not the previous block"))
+        for transaction in block.data[1:]:
+            for trx_in in transaction.trx_in:
+                try:
+                    output = blockchain.get_output(trx_in.block_hash, trx_in.transaction_hash, trx_in.n)
+                except (KeyError, IndexError):
+                    output = None
+                if output is None:
+                    issues.append(AuditIssue(height, block_hash, "unknown output spent in transaction {}".format(transaction.hash.hex())))
+                elif key2address(trx_in.public_key) != output.address:
+                    issues.append(AuditIssue(height, block_hash, "output spent by another key in transaction {}".format(transaction.hash.hex())))
+                try:
+                    signature_valid = verify(trx_in.transaction_hash, trx_in.signature, trx_in.public_key)
+                except (ValueError, TypeError, IndexError):
+                    signature_valid = False
+                if not signature_valid:
+                    issues.append(AuditIssue(height, block_hash, "bad signature in transaction {}".format(transaction.hash.hex())))
+        parent = block_hash
+    return start, issues, timestamps
+
+
+def hardness_schedule(hashes: List[bytes], timestamps: List[int]) -> Iterator[int]:
+    """
+    Hardness of every height after the first, the same as ``BlockChain.hardness_at``
+    of its parent, using sliding windows instead of recomputing each one.
+    """
+    window = deque()
+    lows = deque()
+    highs = deque()
+    total = 0
+    for i in range(len(hashes) - 1):
+        value, timestamp = hash_value(hashes[i]), timestamps[i]
+        window.append((i, value))
+        total += value
+        while lows and lows[-1][1] >= timestamp:
+            lows.pop()
+        lows.append((i, timestamp))
+        while highs and highs[-1][1] <= timestamp:
+            highs.pop()
+        highs.append((i, timestamp))
+        if len(window) > HARDNESS_WINDOW:
+            total -= window.popleft()[1]
+        first = window[0][0]
+        while lows[0][0] < first:
+            lows.popleft()
+        while highs[0][0] < first:
+            highs.popleft()
+
+        if len(window) < 2:
+            yield MAX_HARDNESS
+            continue
+        average_time = (highs[0][1] - lows[0][1]) / (len(window) - 1)
+        average_hardness = total / len(window)
+        hardness = int(average_hardness * average_time / TARGET_TIME)
+        yield max(1, min(hardness, MAX_HARDNESS))
+
+
+def audit(blockchain: BlockChain, processes: int = None, shard_size: int = SHARD_SIZE) -> Iterator[AuditIssue]:
+    """
+    Yield problems with the main chain as they are found, spread over ``processes`` workers.
+    """
+    hashes = blockchain.list_blocks()
+    if hashes and hashes[0] != GENSIS_HASH:
+        yield AuditIssue(0, hashes[0], "not the gensis block")
+    shards = [
+        (start, hashes[start - 1] if start else None, hashes[start:start + shard_size])
+        for start in range(0, len(hashes), shard_size)
+    ]
+    timestamps = [None] * len(hashes)
+    with mp.Pool(processes) as pool:
+        for start, issues, shard_timestamps in pool.imap_unordered(_audit_shard, shards):
+            timestamps[start:start + len(shard_timestamps)] = shard_timestamps
+            yield from issues
+
+    if None in timestamps:
+        yield AuditIssue(None, None, "hardness not checked, some blocks could not be read")
+        return
+    for height, hardness in enumerate(hardness_schedule(hashes, timestamps), 1):
+        if hash_value(hashes[height]) >= hardness:
+            yield AuditIssue(height, hashes[height], "hash does not meet hardness {}".format(hardness))
@@ -4,35 +4,91 @@ import datetime
 import json
 import struct
 from typing import List
-from .transaction import Transaction
-from ..common.interface import Hashable, SerializableAttribute
+from .transaction import Transaction, REWARD, MAX_INDEX
+from ..common.interface import Hashable, SerializableAttribute, u64
 
 
-GENSIS_HASH = b'\x8d\x9d#K<!\x9b\x02t\xea\xdaC\x19.\x14_\x90\x9aA:n+\x04zR\x95o;5I\xad\xac'
+GENSIS_HASH = b'c\x12\xf2\x18\xd7\xf1\xe6l\\k\xd2\xd22<\xd4\xbb\xc9\xb0\xc3\xeb\xdc\xb2\x10\xad\xb6l\x8e\x1a\x01\xa8\xb5\xbb'
+MAX_HARDNESS = 0xFFFFFFFF
+
+
+def hash_value(block_hash: bytes) -> int:
+    """
+    The integer a block hash is compared with the hardness by.
+    """
+    return struct.unpack("<L", block_hash[:4])[0]
+
+
+def block_work(hardness: int) -> int:
+    """
+    Expected number of hashes needed to find a block under ``hardness``.
+    """
+    return (MAX_HARDNESS + 1) // (hardness + 1)
 
 
 class Block(Hashable):
     __slots__ = ['_parent', '_nounce', '_timestamp', '_data', '_chain', '_mapping']
     parent = SerializableAttribute("parent", bytes)
-    nounce = SerializableAttribute('nounce', int)
-    timestamp = SerializableAttribute("timestamp", int)
+    nounce = SerializableAttribute('nounce', u64)
+    timestamp = SerializableAttribute("timestamp", u64)
     data = SerializableAttribute("data", List[Transaction])
     def __init__(self):
         self._chain = None
-        self._mapping = {i: trx.hash for i, trx in enumerate(self.data)}
+        self._mapping = {trx.hash: i for i, trx in enumerate(self.data)}
 
     def bind(self, chain):
         self._chain = chain
+        for transaction in self.data:
+            transaction.bind(chain)
 
-    def is_valid(self) -> bool:
-        coinbase_valid = self.data[0].total_out + sum(trx.fee for trx in self.data[1:]) < 10
-        parent_valid = self.parent == self._chain.head
-        transaction_valid = all(transaction.is_valid() for transaction in self.data[1:])
-        gensis_valid = self.hash == GENSIS_HASH
+    def is_header_valid(self, hardness: int = None) -> bool:
+        """
+        Checks that only need the parent block, so that blocks on a side
+        branch can be stored before their transactions can be verified.
+        ``hardness`` is the one at the parent, when the caller already has it.
+        """
+        if not self._chain.has_block(self.parent):
+            return False
+        if any(trx_in.n > MAX_INDEX for transaction in self.data[1:] for trx_in in transaction.trx_in):
+            return False
+        if hardness is None:
+            hardness = self._chain.hardness_at(self.parent)
+        return hash_value(self.hash) < hardness
+
+    def is_data_valid(self) -> bool:
+        """
+        Checks against the unspent outputs, only meaningful while the parent is head.
+        """
+        if not self.data:
+            return False
+        coinbase = self.data[0]
+        coinbase_valid = (
+            coinbase.coinbase_height == self._chain.height_of(self.parent) + 1
+            and coinbase.total_out <= REWARD + sum(trx.fee for trx in self.data[1:])
+        )
+        transaction_valid = all(transaction.trx_in and transaction.is_valid() for transaction in self.data[1:])
         time_valid = True
-        mission_complete = struct.unpack("<L", self.hash)[0] < self._chain.current_hardness
-        return (parent_valid and transaction_valid and mission_complete and time_valid and coinbase_valid) or gensis_valid
-        
+        return coinbase_valid and self._spends_once() and transaction_valid and time_valid
+
+    def _spends_once(self) -> bool:
+        """
+        Inputs are only checked against the outputs unspent before this block,
+        so an output must not be spent twice within it, not even by one transaction.
+        """
+        seen = set()
+        for transaction in self.data[1:]:
+            for trx_in in transaction.trx_in:
+                key = (trx_in.transaction_hash, trx_in.n)
+                if key in seen:
+                    return False
+                seen.add(key)
+        return True
+
+    def is_valid(self) -> bool:
+        if self.hash == GENSIS_HASH:
+            return True
+        return self.parent == self._chain.head and self.is_header_valid() and self.is_data_valid()
+
     def __getitem__(self, transaction_hash):
         i = self._mapping[transaction_hash]
         return self.data[i]
@@ -0,0 +1,46 @@
+import hashlib
+import math
+import struct
+from ..common.interface import Serializable, SerializableAttribute, u8
+
+
+FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter(Serializable):
+    """
+    Set of byte strings that may answer yes for items never added, but never no for added ones.
+    """
+    n_hashes = SerializableAttribute('n_hashes', u8)
+    bits = SerializableAttribute('bits', bytes)
+
+    @classmethod
+    def new(cls, n_items: int, false_positive_rate: float = FALSE_POSITIVE_RATE):
+        n_items = max(n_items, 1)
+        n_bits = -n_items * math.log(false_positive_rate) / math.log(2) ** 2
+        n_bytes = max(1, math.ceil(n_bits / 8))
+        n_hashes = max(1, min(255, round(n_bytes * 8 / n_items * math.log(2))))
+        return cls(n_hashes=n_hashes, bits=bytes(n_bytes))
+
+    def _positions(self, item: bytes):
+        h1, h2 = struct.unpack("<QQ", hashlib.sha256(item).digest()[:16])
+        n_bits = len(self.bits) * 8
+        return [(h1 + i * h2) % n_bits for i in range(self.n_hashes)]
+
+    def add(self, *items: bytes):
+        bits = bytearray(self.bits)
+        for item in items:
+            for position in self._positions(item):
+                bits[position >> 3] |= 1 << (position & 7)
+        self.bits = bytes(bits)
+
+    def __contains__(self, item: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @classmethod
+    def from_items(cls, items, false_positive_rate: float = FALSE_POSITIVE_RATE):
+        items = list(items)
+        bloom = cls.new(len(items), false_positive_rate)
+        bloom.add(*items)
+        return bloom
@@ -1,23 +1,113 @@
-from itertools import chain
-from typing import Iterable, Union
 import struct
-from .block import Block
+from itertools import chain
+from typing import Iterable, List, Optional, Tuple, Union
+from .block import Block, GENSIS_HASH, MAX_HARDNESS, hash_value, block_work
+from .transaction import TransactionOut
+from .bloom import BloomFilter
 from ..db.redis_ import get_redis
-from ..common.interface.serialize import Serializable, SerializableAttribute
+from ..common.interface.serialize import Serializable, SerializableAttribute, BYTES_ORDER, varint
+from ..encryption.keys import key2address
 from ..encryption.signature import verify
 
 
+TARGET_TIME = 600
+HARDNESS_WINDOW = 1000
+FILTER_BATCH = 1000
+BLOCK_PREFIX = b"B"
+UNDO_PREFIX = b"U"
+FILTER_PREFIX = b"F"
+
+
+def block_key(block_hash: bytes) -> bytes:
+    return BLOCK_PREFIX + block_hash
+
+
+def undo_key(block_hash: bytes) -> bytes:
+    return UNDO_PREFIX + block_hash
+
+
+def filter_key(block_hash: bytes) -> bytes:
+    return FILTER_PREFIX + block_hash
+
+
+def outpoint(transaction_hash: bytes, n: int) -> bytes:
+    """
+    Fixed 36 bytes key of an output: the transaction hash followed by the index.
+    """
+    return transaction_hash + struct.pack("{}L".format(BYTES_ORDER), n)
+
+
 class OpenTransaction(Serializable):
     block_hash = SerializableAttribute('block_hash', bytes)
     transaction_hash = SerializableAttribute('transaction_hash', bytes)
-    n = SerializableAttribute('n', int)
+    n = SerializableAttribute('n', varint)
+
+    @property
+    def outpoint(self) -> bytes:
+        return outpoint(self.transaction_hash, self.n)
+
+    @classmethod
+    def from_outpoint(cls, key: bytes, block_hash: bytes):
+        n = struct.unpack("{}L".format(BYTES_ORDER), key[32:])[0]
+        return cls(block_hash=block_hash, transaction_hash=key[:32], n=n)
+
+
+class BlockUndo(Serializable):
+    """
+    What connecting a block did to ``open_transactions``, so that it can be
+    disconnected again without looking at the block itself.
+    """
+    spent = SerializableAttribute('spent', List[OpenTransaction])
+    created = SerializableAttribute('created', List[OpenTransaction])
+
+    @classmethod
+    def from_block(cls, block: Block):
+        block_hash = block.hash
+        spent = []
+        created = []
+        for i, transaction in enumerate(block.data):
+            # The input of the coinbase spends nothing.
+            for transaction_in in transaction.trx_in if i else ():
+                _block_hash = transaction_in.block_hash
+                _transaction_hash = transaction_in.transaction_hash
+                _n = transaction_in.n
+                spent.append(OpenTransaction(block_hash=_block_hash, transaction_hash=_transaction_hash, n=_n))
+            for n in range(len(transaction.trx_out)):
+                created.append(OpenTransaction(block_hash=block_hash, transaction_hash=transaction.hash, n=n))
+        return cls(spent=spent, created=created)
+
+
+def compute_hardness(hashes: List[bytes], timestamps: List[int]) -> int:
+    """
+    Hardness following a window of blocks, given their hashes and timestamps.
+    """
+    if len(hashes) < 2:
+        return MAX_HARDNESS
+    timestamps = sorted(timestamps)
+    average_time = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+    average_hardness = sum(hash_value(h) for h in hashes) / len(hashes)
+    hardness = int(average_hardness * average_time / TARGET_TIME)
+    return max(1, min(hardness, MAX_HARDNESS))
+
+
+def block_filter(block: Block) -> BloomFilter:
+    """
+    Filter over the addresses a block pays and the addresses it spends from.
+    """
+    items = []
+    for i, transaction in enumerate(block.data):
+        # The input of the coinbase spends nothing.
+        if i:
+            items.extend(key2address(trx_in.public_key) for trx_in in transaction.trx_in)
+        items.extend(trx_out.address for trx_out in transaction.trx_out)
+    return BloomFilter.from_items(items)
 
 
 class BlockChain:
     def __init__(self):
         self._redis = get_redis()
         self._hardness = None
-        
+
     def initialize(self):
         keys = self._redis.keys()
         if keys:
@@ -32,17 +122,42 @@ class BlockChain:
     @property
     def current_hardness(self) -> int:
         if self._hardness is None:
-            hashes = self._redis.lrange("hashes", -1000, -1)
-            timestamps = sorted([self[h].timestamp for h in hashes])
-            average_time = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
-            target_time = 600
-            average_hardness = sum(struct.unpack("<L", h)[0] for h in hashes) / len(hashes)
-            self._hardness = int(average_hardness * average_time / target_time)
+            self._hardness = self.hardness_at(self.head)
         return self._hardness
 
+    def hardness_at(self, block_hash: bytes) -> int:
+        """
+        Hardness a child of ``block_hash`` has to satisfy, computed from the
+        ancestors of that block rather than from the main chain.
+        """
+        hashes = self.ancestors(block_hash, HARDNESS_WINDOW)
+        if len(hashes) < 2:
+            return MAX_HARDNESS
+        timestamps = self._redis.hmget("TIMESTAMP", hashes)
+        timestamps = [self[h].timestamp if t is None else int(t) for h, t in zip(hashes, timestamps)]
+        return compute_hardness(hashes, timestamps)
+
+    def ancestors(self, block_hash: bytes, n: int) -> List[bytes]:
+        """
+        Up to ``n`` hashes ending with ``block_hash``, oldest first.
+        """
+        branch = []
+        while len(branch) < n and not self.is_main_chain(block_hash):
+            branch.append(block_hash)
+            block_hash = self[block_hash].parent
+        branch.reverse()
+        remain = n - len(branch)
+        if remain == 0:
+            return branch
+        height = self.height_of(block_hash)
+        return self._redis.lrange("hashes", max(0, height - remain + 1), height) + branch
+
     @property
     def open_transactions(self):
-        return (OpenTransaction.deserialize(ot) for ot in self._redis.smembers('open_transactions'))
+        """
+        ``open_transactions`` maps the outpoint of every unspent output to the hash of its block.
+        """
+        return (OpenTransaction.from_outpoint(key, block_hash) for key, block_hash in self._redis.hscan_iter('open_transactions'))
 
     def untrusted_blocks(self) -> Iterable[str]:
         """
@@ -61,41 +176,170 @@ class BlockChain:
         return self._redis.lrange('hashes', 0, -1)
 
     def is_cash_spent(self, transaction_in):
-        raise NotImplementedError
+        key = outpoint(transaction_in.transaction_hash, transaction_in.n)
+        return self._redis.hget("open_transactions", key) != transaction_in.block_hash
+
+    def get_output(self, block_hash: bytes, transaction_hash: bytes, n: int) -> Optional[TransactionOut]:
+        """
+        Outputs imported from a snapshot live in COINS, since their blocks may not be stored.
+        Returns None if the block is unknown, and raises KeyError or IndexError if the
+        block has no such transaction or output.
+        """
+        coin = self._redis.hget("COINS", outpoint(transaction_hash, n))
+        if coin is not None:
+            return TransactionOut.deserialize(coin)
+        if not self._redis.exists(block_key(block_hash)):
+            return None
+        return self[block_hash][transaction_hash].trx_out[n]
+
+    def address_history(self, address: bytes) -> List[Tuple[int, Block]]:
+        """
+        Main chain blocks paying ``address`` or spending its outputs, oldest first.
+        Only blocks whose filter matches are deserialized, blocks without a filter always are.
+        Blocks that were never stored, like those below an imported snapshot, are skipped.
+        """
+        hashes = self.list_blocks()
+        history = []
+        for start in range(0, len(hashes), FILTER_BATCH):
+            batch = hashes[start:start + FILTER_BATCH]
+            filters = self._redis.mget([filter_key(h) for h in batch])
+            for height, (block_hash, raw) in enumerate(zip(batch, filters), start):
+                if raw is not None and address not in BloomFilter.deserialize(raw):
+                    continue
+                raw = self._redis.get(block_key(block_hash))
+                if raw is None:
+                    continue
+                block = Block.deserialize(raw)
+                # Inputs of main chain blocks are signed by the owner of the output they spend.
+                spends = any(
+                    key2address(trx_in.public_key) == address
+                    for transaction in block.data[1:]
+                    for trx_in in transaction.trx_in
+                )
+                pays = any(trx_out.address == address for transaction in block.data for trx_out in transaction.trx_out)
+                if spends or pays:
+                    history.append((height, block))
+        return history
+
+    def has_block(self, block_hash: bytes) -> bool:
+        return bool(self._redis.hexists("HEIGHT", block_hash))
+
+    def height_of(self, block_hash: bytes) -> int:
+        return int(self._redis.hget("HEIGHT", block_hash))
+
+    def work_of(self, block_hash: bytes) -> int:
+        """
+        Accumulated work of the branch ending with ``block_hash``.
+        """
+        return int(self._redis.hget("WORK", block_hash))
+
+    def is_main_chain(self, block_hash: bytes) -> bool:
+        height = self._redis.hget("HEIGHT", block_hash)
+        return height is not None and self._redis.lindex("hashes", int(height)) == block_hash
 
     def __len__(self):
-        return len(self._redis.keys("BLOCK:*"))
+        return self._redis.llen("hashes")
 
     def __getitem__(self, index: Union[bytes, int]) -> Block:
         if isinstance(index, int):
             index = self._redis.lindex("hashes", index)
-        key = "BLOCK:{}".format(index)
-        return Block.deserialize(self._redis.get(key))
+        return Block.deserialize(self._redis.get(block_key(index)))
 
     def append(self, block: Block):
-        # Blocks
+        """
+        Store a block and switch to its branch if that carries the most work.
+        Blocks whose parent is unknown are rejected.
+        """
         block.bind(self)
-        if not block.is_valid():
+        block_hash = block.hash
+        if self.has_block(block_hash):
+            return
+        head = self.head
+        if block_hash == GENSIS_HASH:
+            height, work = 0, 0
+        else:
+            if not self.has_block(block.parent):
+                raise RuntimeError("Block invalid")
+            hardness = self.hardness_at(block.parent)
+            if not block.is_header_valid(hardness):
+                raise RuntimeError("Block invalid")
+            height = self.height_of(block.parent) + 1
+            work = self.work_of(block.parent) + block_work(hardness)
+        if block.parent == head and not block.is_data_valid():
             raise RuntimeError("Block invalid")
-        serial = block.serialize()
-        self._redis.set("BLOCK:{}".format(block.hash), serial)
-        self._redis.rpush("hashes", block.hash)
+
+        bloom = block_filter(block)
+        self._redis.set(block_key(block_hash), block.serialize())
+        self._redis.set(filter_key(block_hash), bloom.serialize())
+        self._redis.hset("HEIGHT", block_hash, height)
+        self._redis.hset("WORK", block_hash, work)
+        self._redis.hset("TIMESTAMP", block_hash, block.timestamp)
+        if head is None or block.parent == head:
+            self._connect(block)
+        elif work > self.work_of(head):
+            self._reorganize(block_hash)
         self._redis.bgsave()
         self._hardness = None
 
-        # Open transactions
+    def _reorganize(self, tip: bytes):
+        branch = []
+        block_hash = tip
+        while not self.is_main_chain(block_hash):
+            branch.append(block_hash)
+            block_hash = self[block_hash].parent
+        fork = block_hash
+        branch.reverse()
+
+        disconnected = []
+        while self.head != fork:
+            disconnected.append(self._disconnect())
+        disconnected.reverse()
+
+        for i, block_hash in enumerate(branch):
+            block = self[block_hash]
+            block.bind(self)
+            if not block.is_data_valid():
+                while self.head != fork:
+                    self._disconnect()
+                for old_hash in disconnected:
+                    self._connect(self[old_hash])
+                self._forget(branch[i:])
+                raise RuntimeError("Block invalid")
+            self._connect(block)
+
+    def _connect(self, block: Block):
         block_hash = block.hash
-        open_transactions = []
-        close_transactions = []
-        for transaction in block.data:
-            for transaction_in in transaction.trx_in:
-                _block_hash = transaction_in.block_hash
-                _transaction_hash = transaction_in.transaction_hash
-                _n = transaction_in.n
-                close_transactions.append(OpenTransaction(block_hash=_block_hash, transaction_hash=_transaction_hash, n=_n).serialize())
-            for n in range(len(transaction.trx_out)):
-                open_transactions.append(OpenTransaction(block_hash=block_hash, transaction_hash=transaction.hash, n=n).serialize())
-        if close_transactions:
-            self._redis.srem("open_transactions", *close_transactions)
-        if open_transactions:
-            self._redis.sadd("open_transactions", *open_transactions)
+        undo = BlockUndo.from_block(block)
+
+        pipe = self._redis.pipeline()
+        pipe.set(undo_key(block_hash), undo.serialize())
+        if undo.created:
+            pipe.hset("open_transactions", mapping={ot.outpoint: ot.block_hash for ot in undo.created})
+        if undo.spent:
+            pipe.hdel("open_transactions", *[ot.outpoint for ot in undo.spent])
+        pipe.rpush("hashes", block_hash)
+        pipe.execute()
+
+    def _disconnect(self) -> bytes:
+        """
+        Roll ``open_transactions`` back past the head block and drop it from the main chain.
+        """
+        block_hash = self.head
+        undo = BlockUndo.deserialize(self._redis.get(undo_key(block_hash)))
+
+        pipe = self._redis.pipeline()
+        if undo.spent:
+            pipe.hset("open_transactions", mapping={ot.outpoint: ot.block_hash for ot in undo.spent})
+        if undo.created:
+            pipe.hdel("open_transactions", *[ot.outpoint for ot in undo.created])
+        pipe.delete(undo_key(block_hash))
+        pipe.rpop("hashes")
+        pipe.execute()
+        return block_hash
+
+    def _forget(self, hashes: List[bytes]):
+        for block_hash in hashes:
+            self._redis.delete(block_key(block_hash), filter_key(block_hash))
+            self._redis.hdel("HEIGHT", block_hash)
+            self._redis.hdel("WORK", block_hash)
+            self._redis.hdel("TIMESTAMP", block_hash)
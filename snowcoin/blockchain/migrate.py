@@ -0,0 +1,85 @@
+"""
+Bring a database up to the current layout: add the filter of every block
+stored without one. Running it again does nothing.
+
+Databases written before lengths and output indexes became varints can not
+be migrated. Block hashes, transaction hashes and so the proof of work and
+the signatures all cover the old encoding, re-encoding would break them.
+That includes every database with ``"BLOCK:{}".format(block_hash)`` keys,
+``open_transactions`` stored as a set or ``COINS`` keyed by serialized
+``OpenTransaction``, since those layouts predate the change. Such databases
+are refused before anything is written and have to be synced again, from
+the network or from a snapshot.
+"""
+import warnings
+from .block import Block, GENSIS_HASH
+from .chain import BlockChain, BlockUndo, BLOCK_PREFIX, UNDO_PREFIX, block_filter, filter_key
+
+
+def _decodes(cls, raw: bytes) -> bool:
+    """
+    Whether ``raw`` decodes as ``cls`` with nothing left over.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            cls.deserialize(raw)
+        except Exception:
+            return False
+    return True
+
+
+def _old_encoding(redis) -> list:
+    """
+    Keys written with the encoding from before varints.
+    """
+    bad = []
+    hashes = redis.lrange("hashes", 0, 0)
+    if hashes and hashes[0] != GENSIS_HASH:
+        bad.append(b"hashes")
+    for pattern in ["BLOCK:*", "UNDO:*"]:
+        bad.extend(redis.scan_iter(match=pattern))
+    if redis.type("open_transactions") == b"set":
+        bad.append(b"open_transactions")
+    if any(len(key) != 36 for key, _ in redis.hscan_iter("COINS", count=1000)):
+        bad.append(b"COINS")
+    for prefix, cls in [(BLOCK_PREFIX, Block), (UNDO_PREFIX, BlockUndo)]:
+        for key in redis.scan_iter(match=prefix + b"*"):
+            if len(key) == len(prefix) + 32 and not _decodes(cls, redis.get(key)):
+                bad.append(key)
+    return bad
+
+
+def _build_filters(redis):
+    """
+    Add the filter of every stored block that has none.
+    """
+    n = 0
+    for key in redis.scan_iter(match=BLOCK_PREFIX + b"*"):
+        block_hash = key[len(BLOCK_PREFIX):]
+        if len(block_hash) != 32 or redis.exists(filter_key(block_hash)):
+            continue
+        block = Block.deserialize(redis.get(key))
+        redis.set(filter_key(block_hash), block_filter(block).serialize())
+        n += 1
+    return n
+
+
+def migrate(blockchain: BlockChain):
+    """
+    Returns how many items of each kind were added. Raises RuntimeError
+    without changing anything if the database uses the old encoding.
+    """
+    redis = blockchain._redis
+    bad = _old_encoding(redis)
+    if bad:
+        raise RuntimeError("{} keys use the encoding from before varints, starting with {!r}; "
+                           "this database can not be migrated and has to be synced again".format(len(bad), bad[0]))
+    return [
+        ("block filters", _build_filters(redis)),
+    ]
+
+
+if __name__ == '__main__':
+    for name, n in migrate(BlockChain()):
+        print("{}: {}".format(name, n))
@@ -0,0 +1,274 @@
+"""
+Export and import of the unspent outputs at a given height.
+
+A snapshot file is a stream of length-prefixed records followed by the
+sha256 digest of everything before it:
+
+1. a ``SnapshotHeader``
+2. ``HashesChunk`` records with the main chain hashes up to the snapshot
+   block, ending with an empty chunk
+3. the last ``HARDNESS_WINDOW`` blocks, which the hardness of the next
+   block is computed from
+4. ``CoinsChunk`` records with every unspent output, ending with an empty chunk
+
+The digest only shows the file is intact. Pass the digest published by a
+trusted node to ``import_snapshot`` to also know it is the right snapshot.
+Blocks below the snapshot are not downloaded or checked afterwards, the
+node trusts that history until it is synced by other means.
+"""
+import hashlib
+import struct
+import uuid
+from functools import lru_cache
+from itertools import chain
+from typing import List
+from .block import Block
+from .chain import BlockChain, BlockUndo, OpenTransaction, HARDNESS_WINDOW, block_filter, block_key, filter_key, undo_key
+from .transaction import TransactionOut
+from ..common.interface.serialize import Serializable, SerializableAttribute, BYTES_ORDER, u64, varint
+
+
+CHUNK_SIZE = 1000
+
+
+class SnapshotHeader(Serializable):
+    block_hash = SerializableAttribute('block_hash', bytes)
+    height = SerializableAttribute('height', u64)
+    work = SerializableAttribute('work', u64)
+    n_blocks = SerializableAttribute('n_blocks', varint)
+
+
+class HashesChunk(Serializable):
+    hashes = SerializableAttribute('hashes', List[bytes])
+
+
+class Coin(Serializable):
+    open_transaction = SerializableAttribute('open_transaction', OpenTransaction)
+    output = SerializableAttribute('output', TransactionOut)
+
+
+class CoinsChunk(Serializable):
+    coins = SerializableAttribute('coins', List[Coin])
+
+
+class SnapshotWriter:
+    def __init__(self, f):
+        self._file = f
+        self._digest = hashlib.sha256()
+
+    def write(self, item: Serializable):
+        payload = item.serialize()
+        record = struct.pack("{}L".format(BYTES_ORDER), len(payload)) + payload
+        self._digest.update(record)
+        self._file.write(record)
+
+    def close(self) -> str:
+        self._file.write(self._digest.digest())
+        return self._digest.hexdigest()
+
+
+class SnapshotReader:
+    def __init__(self, f):
+        self._file = f
+        self._digest = hashlib.sha256()
+
+    def read(self, cls):
+        size = struct.calcsize("{}L".format(BYTES_ORDER))
+        prefix = self._file.read(size)
+        if len(prefix) < size:
+            raise ValueError("Snapshot truncated")
+        n = struct.unpack("{}L".format(BYTES_ORDER), prefix)[0]
+        payload = self._file.read(n)
+        if len(payload) < n:
+            raise ValueError("Snapshot truncated")
+        self._digest.update(prefix)
+        self._digest.update(payload)
+        return cls.deserialize(payload)
+
+    def close(self) -> str:
+        if self._file.read(32) != self._digest.digest():
+            raise ValueError("Snapshot hash unmatch")
+        return self._digest.hexdigest()
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_snapshot(blockchain: BlockChain, filename: str, height: int = None) -> str:
+    """
+    Write the unspent outputs as they were right after the block at ``height``,
+    by default the head. Blocks above ``height`` are rolled back with their
+    undo records, so the cost grows with the distance to the head. Returns
+    the hex digest the file ends with.
+    """
+    redis = blockchain._redis
+    staging = "snapshot:{}:".format(uuid.uuid4().hex)
+    hashes_key = staging + "hashes"
+    snapshot_key = staging + "open_transactions"
+    if height is None:
+        height = len(blockchain) - 1
+    if height < 0:
+        raise ValueError("No block at height {}".format(height))
+
+    def freeze(pipe):
+        hashes = pipe.lrange("hashes", height, -1)
+        if not hashes:
+            raise ValueError("No block at height {}".format(height))
+        undos = pipe.mget([undo_key(h) for h in hashes[1:]]) if len(hashes) > 1 else []
+        pipe.multi()
+        # The main chain is copied along, a reorganization during the export
+        # would otherwise change the hashes below ``height`` while they are written.
+        pipe.copy("hashes", hashes_key, replace=True)
+        pipe.copy("open_transactions", snapshot_key, replace=True)
+        return hashes[0], undos
+
+    block_hash, undos = redis.transaction(freeze, "hashes", value_from_callable=True)
+    try:
+        # The last rollback touching an outpoint decides whether it is unspent at ``height``,
+        # None marks outpoints that were not created yet.
+        overrides = {}
+        for undo in reversed(undos):
+            undo = BlockUndo.deserialize(undo)
+            for ot in undo.created:
+                overrides[ot.outpoint] = None
+            for ot in undo.spent:
+                overrides[ot.outpoint] = ot.block_hash
+        outpoints = (
+            (key, overrides.get(key, value))
+            for key, value in redis.hscan_iter(snapshot_key, count=CHUNK_SIZE)
+        )
+        restored = (
+            (key, value)
+            for key, value in overrides.items()
+            if not redis.hexists(snapshot_key, key)
+        )
+        outpoints = (OpenTransaction.from_outpoint(key, value) for key, value in chain(outpoints, restored) if value is not None)
+
+        window = blockchain.ancestors(block_hash, HARDNESS_WINDOW)
+        header = SnapshotHeader(
+            block_hash=block_hash,
+            height=height,
+            work=blockchain.work_of(block_hash),
+            n_blocks=len(window),
+        )
+        get_block = lru_cache(maxsize=256)(blockchain.__getitem__)
+        with open(filename, "wb") as f:
+            writer = SnapshotWriter(f)
+            writer.write(header)
+            for start in range(0, height + 1, CHUNK_SIZE):
+                writer.write(HashesChunk(hashes=redis.lrange(hashes_key, start, min(start + CHUNK_SIZE, height + 1) - 1)))
+            writer.write(HashesChunk(hashes=[]))
+            for h in window:
+                writer.write(get_block(h))
+            for chunk in _chunks(outpoints, CHUNK_SIZE):
+                coins = []
+                for ot in chunk:
+                    output = redis.hget("COINS", ot.outpoint)
+                    if output is not None:
+                        output = TransactionOut.deserialize(output)
+                    else:
+                        output = get_block(ot.block_hash)[ot.transaction_hash].trx_out[ot.n]
+                    coins.append(Coin(open_transaction=ot, output=output))
+                writer.write(CoinsChunk(coins=coins))
+            writer.write(CoinsChunk(coins=[]))
+            digest = writer.close()
+    finally:
+        redis.delete(hashes_key, snapshot_key)
+    return digest
+
+
+def import_snapshot(blockchain: BlockChain, filename: str, expected_digest: str = None) -> str:
+    """
+    Load a snapshot into an empty database. The snapshot block becomes the
+    head, and blocks below it can not be reorganized away. Everything is
+    staged under temporary keys until the digest is checked, against
+    ``expected_digest`` too when given. Returns the hex digest of the snapshot.
+    """
+    redis = blockchain._redis
+    if len(blockchain):
+        raise RuntimeError("Can only import a snapshot into an empty blockchain")
+    staging = "snapshot:{}:".format(uuid.uuid4().hex)
+    hashes_key = staging + "hashes"
+    blocks_key = staging + "blocks"
+    open_transactions_key = staging + "open_transactions"
+    coins_key = staging + "COINS"
+    try:
+        with open(filename, "rb") as f:
+            reader = SnapshotReader(f)
+            header = reader.read(SnapshotHeader)
+            pipe = redis.pipeline()
+            last = None
+            while True:
+                chunk = reader.read(HashesChunk)
+                if not chunk.hashes:
+                    break
+                pipe.rpush(hashes_key, *chunk.hashes)
+                pipe.execute()
+                last = chunk.hashes[-1]
+            if last != header.block_hash:
+                raise ValueError("Snapshot does not end with block {}".format(header.block_hash))
+
+            parent = None
+            for _ in range(header.n_blocks):
+                block = reader.read(Block)
+                if parent is not None and block.parent != parent:
+                    raise ValueError("Snapshot blocks are not a chain")
+                pipe.hset(blocks_key, block.hash, block.serialize())
+                parent = block.hash
+            pipe.execute()
+            if parent != header.block_hash:
+                raise ValueError("Snapshot does not end with block {}".format(header.block_hash))
+
+            while True:
+                chunk = reader.read(CoinsChunk)
+                if not chunk.coins:
+                    break
+                ots = [coin.open_transaction for coin in chunk.coins]
+                pipe.hset(open_transactions_key, mapping={ot.outpoint: ot.block_hash for ot in ots})
+                pipe.hset(coins_key, mapping={ot.outpoint: coin.output.serialize() for ot, coin in zip(ots, chunk.coins)})
+                pipe.execute()
+            digest = reader.close()
+        if expected_digest is not None and digest != expected_digest.lower():
+            raise ValueError("Snapshot digest {} is not the expected {}".format(digest, expected_digest))
+
+        for block_hash, raw in redis.hscan_iter(blocks_key, count=CHUNK_SIZE):
+            block = Block.deserialize(raw)
+            pipe.set(block_key(block_hash), raw)
+            pipe.set(filter_key(block_hash), block_filter(block).serialize())
+            pipe.hset("TIMESTAMP", block_hash, block.timestamp)
+        pipe.execute()
+        pipe = redis.pipeline(transaction=True)
+        pipe.rename(hashes_key, "hashes")
+        if redis.exists(open_transactions_key):
+            pipe.rename(open_transactions_key, "open_transactions")
+            pipe.rename(coins_key, "COINS")
+        pipe.hset("HEIGHT", header.block_hash, header.height)
+        pipe.hset("WORK", header.block_hash, header.work)
+        pipe.execute()
+    finally:
+        redis.delete(hashes_key, blocks_key, open_transactions_key, coins_key)
+    blockchain._hardness = None
+    return digest
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Export or import an open transactions snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("filename")
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--sha256", default=None, help="digest the imported snapshot must have")
+    args = parser.parse_args()
+    if args.command == "export":
+        digest = export_snapshot(BlockChain(), args.filename, args.height)
+    else:
+        digest = import_snapshot(BlockChain(), args.filename, args.sha256)
+    print("sha256: {}".format(digest))
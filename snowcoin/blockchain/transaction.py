@@ -1,60 +1,62 @@
 from collections import namedtuple
-from typing import List
+from typing import List, Optional
 import json
 import hashlib
-import Crypto
 from ..encryption.signature import verify
 from ..encryption.keys import key2address
-from ..common.interface import Hashable, SerializableAttribute
+from ..common.interface import Hashable, SerializableAttribute, varint
+
+
+REWARD = 10.0
+# Outpoints keep the output index in four bytes.
+MAX_INDEX = 0xFFFFFFFF
+COINBASE_HASH = b""
 
 
 class TransactionIn(Hashable):
-    __slots__ = ['_block_hash', '_transaction_hash', '_n', '_public_key', '_signature', '_chain', '_transaction']
+    __slots__ = ['_block_hash', '_transaction_hash', '_n', '_public_key', '_signature', '_chain', '_output']
     block_hash = SerializableAttribute("block_hash", bytes)
     transaction_hash = SerializableAttribute("transaction_hash", bytes)
-    n = SerializableAttribute("n", int)
+    n = SerializableAttribute("n", varint)
     public_key = SerializableAttribute("public_key", bytes)
     signature = SerializableAttribute("signature", bytes)
     def __init__(self):
         self._chain = None
-        self._transaction = None
+        self._output = None
 
     def _verify_is_owned(self) -> bool:
-        key_valid = key2address(self.public_key) == self._transaction.trx_out[self.n].address
+        key_valid = key2address(self.public_key) == self._output.address
         signature_valid = verify(self.transaction_hash, self.signature, self.public_key)
         return key_valid and signature_valid
 
     def _verify_exists(self) -> bool:
-        return self._transaction
+        return self._output is not None
 
     def bind(self, blockchain) -> bool:
         if self._chain == blockchain:
             return True
         try:
-            block = blockchain[self.block_hash]
-            transaction = block[self.transaction_hash]
-        except KeyError:
+            output = blockchain.get_output(self.block_hash, self.transaction_hash, self.n)
+        except (KeyError, IndexError):
             return False
-        else:
-            self._chain = blockchain
-            self._block = block
-            self._transaction = transaction
-            return True
+        if output is None:
+            return False
+        self._chain = blockchain
+        self._output = output
+        return True
 
     def is_valid(self) -> bool:
         return self._verify_exists() and self._verify_is_owned() and not self._chain.is_cash_spent(self)
 
     @property
-    def transaction(self):
-        if self._transaction is None:
+    def output(self):
+        if self._output is None:
             raise RuntimeError("You need to bind this TransactionIn with a blockchain first.")
-        return self._transaction
+        return self._output
 
     @property
     def amount(self):
-        if self._transaction is None:
-            raise RuntimeError("You need to bind this TransactionIn with a blockchain first.")
-        return self._transaction.data[self.n].amount
+        return self.output.amount
 
 
 class TransactionOut(Hashable):
@@ -80,7 +82,7 @@ class Transaction(Hashable):
     def is_valid(self) -> bool:
         """
         Check if a transaction is validate
-        1. Sum of ins >= sum of outs
+        1. Sum of ins >= sum of outs, the difference is the fee
         2. Every in exists in the former blocks(six before)
         3. None of the ins has been spent
         4. The sender owns all the ins
@@ -116,14 +118,29 @@ class Transaction(Hashable):
 
     @property
     def fee(self) -> float:
-        return self.total_out - self.total_in
+        return self.total_in - self.total_out
+
+    @property
+    def coinbase_height(self) -> Optional[int]:
+        """
+        Height a coinbase was made for, None for other transactions.
+        """
+        if len(self.trx_in) != 1 or self.trx_in[0].transaction_hash != COINBASE_HASH:
+            return None
+        return self.trx_in[0].n
 
 
 class CoinBase(Transaction):
-    def __init__(self, address):
-        self.trx_in = []
-        self.trx_out = [TransactionOut(address=address, amount=10.0)]
+    """
+    Its only input spends nothing and carries the height of the block, so that
+    coinbases paying the same address in different blocks have different hashes.
+    """
+    def __init__(self, address, height):
+        self._chain = None
+        self.trx_in = [TransactionIn(block_hash=COINBASE_HASH, transaction_hash=COINBASE_HASH, n=height, public_key=b"", signature=b"")]
+        self.trx_out = [TransactionOut(address=address, amount=REWARD)]
 
     def add_fee(self, fee):
-        self.trx_out[0].amount += fee
+        self.trx_out[0].add_amount(fee)
+        self._hash = None
 
@@ -0,0 +1,206 @@
+"""
+Command line entry point. Every subcommand imports what it needs when it
+runs, so that short commands do not pay for the backends of the others.
+"""
+import argparse
+import os
+import sys
+import time
+from .common.settings import WORKSPACE
+
+
+DEFAULT_KEY_PATH = os.path.join(WORKSPACE, 'key.der')
+
+
+def load_keys(path):
+    from .encryption.keys import KeyPair
+    with open(path, "rb") as f:
+        return KeyPair(f.read())
+
+
+def node(args):
+    import Pyro4
+    from .blockchain import BlockChain
+    blockchain = BlockChain()
+    if not len(blockchain):
+        blockchain.initialize()
+    Pyro4.expose(BlockChain)
+    Pyro4.Daemon.serveSimple({
+        blockchain: 'snowcoin.blockchain',
+    }, host=args.host, port=args.port, ns=False)
+
+
+def mine(args):
+    """
+    Append the blocks found by ``--processes`` miners until interrupted.
+    """
+    import multiprocessing as mp
+    from .blockchain import Block
+    from .coin.miner import Miner
+    from .coin.wallet import Wallet
+    wallet = Wallet(load_keys(args.key))
+    if not len(wallet):
+        wallet.initialize()
+    queue = mp.Queue()
+    miners = [Miner(wallet, queue) for _ in range(args.processes)]
+    for miner in miners:
+        miner.start()
+    try:
+        while True:
+            block = Block.deserialize(queue.get())
+            try:
+                wallet.append(block)
+            except RuntimeError:
+                continue
+            print("block {} at height {}".format(block.hash.hex(), wallet.height_of(block.hash)), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for miner in miners:
+            miner.terminate()
+            miner.join()
+
+
+def wallet_new(args):
+    from .encryption.keys import KeyPair
+    if os.path.exists(args.key):
+        raise SystemExit("{} already exists".format(args.key))
+    os.makedirs(os.path.dirname(os.path.abspath(args.key)), exist_ok=True)
+    keys = KeyPair.new()
+    with open(args.key, "wb") as f:
+        f.write(keys.private_key())
+    print(keys.address.decode())
+
+
+def wallet_balance(args):
+    from .coin.wallet import Wallet
+    wallet = Wallet(load_keys(args.key))
+    print(wallet.amount())
+
+
+def migrate_database(args):
+    from .blockchain import BlockChain
+    from .blockchain.migrate import migrate
+    try:
+        moved = migrate(BlockChain())
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    for name, n in moved:
+        print("{}: {}".format(name, n))
+
+
+def snapshot_export(args):
+    from .blockchain import BlockChain
+    from .blockchain.snapshot import export_snapshot
+    print("sha256: {}".format(export_snapshot(BlockChain(), args.filename, args.height)))
+
+
+def snapshot_import(args):
+    from .blockchain import BlockChain
+    from .blockchain.snapshot import import_snapshot
+    try:
+        digest = import_snapshot(BlockChain(), args.filename, args.sha256)
+    except (RuntimeError, ValueError) as e:
+        raise SystemExit(str(e))
+    print("sha256: {}".format(digest))
+
+
+def audit(args):
+    from .blockchain import BlockChain
+    from .blockchain.audit import audit
+    n = 0
+    for issue in audit(BlockChain(), processes=args.processes):
+        block_hash = issue.block_hash.hex() if issue.block_hash else "-"
+        print("{}\t{}\t{}".format(issue.height, block_hash, issue.message), flush=True)
+        n += 1
+    print("{} issues found".format(n))
+    return 1 if n else 0
+
+
+def bench(args):
+    """
+    Time serializing, deserializing and hashing a block of ``--transactions`` transactions.
+    """
+    from .blockchain import Block
+    from .blockchain.transaction import Transaction, TransactionIn, TransactionOut
+    transactions = [
+        Transaction(
+            trx_in=[TransactionIn(block_hash=b"\0" * 32, transaction_hash=b"\0" * 32, n=i, public_key=b"\0" * 294, signature=b"\0" * 256)],
+            trx_out=[TransactionOut(address=b"\0" * 32, amount=1.0), TransactionOut(address=b"\1" * 32, amount=2.0)],
+        )
+        for i in range(args.transactions)
+    ]
+    block = Block(parent=b"\0" * 32, nounce=0, timestamp=int(time.time()), data=transactions)
+    buffer = block.serialize()
+
+    def measure(name, func):
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            func()
+        elapsed = time.perf_counter() - start
+        print("{:<12}{:>12.3f} ms/block".format(name, elapsed / args.rounds * 1000))
+
+    print("block of {} transactions, {} bytes".format(args.transactions, len(buffer)))
+    measure("serialize", block.serialize)
+    measure("deserialize", lambda: Block.deserialize(buffer))
+    measure("hash", lambda: Block(parent=block.parent, nounce=block.nounce, timestamp=block.timestamp, data=block.data).hash)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="snowcoin")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    parser_node = subparsers.add_parser("node", help="serve the blockchain")
+    parser_node.add_argument("--host", default="localhost")
+    parser_node.add_argument("--port", type=int, default=0)
+    parser_node.set_defaults(func=node)
+
+    parser_mine = subparsers.add_parser("mine", help="mine blocks for a wallet")
+    parser_mine.add_argument("--key", default=DEFAULT_KEY_PATH, help="DER encoded private key")
+    parser_mine.add_argument("--processes", type=int, default=os.cpu_count())
+    parser_mine.set_defaults(func=mine)
+
+    parser_wallet = subparsers.add_parser("wallet", help="wallet commands")
+    wallet_subparsers = parser_wallet.add_subparsers(dest="wallet_command")
+    wallet_subparsers.required = True
+    parser_new = wallet_subparsers.add_parser("new", help="create a key and print its address")
+    parser_new.add_argument("--key", default=DEFAULT_KEY_PATH, help="where to write the DER encoded private key")
+    parser_new.set_defaults(func=wallet_new)
+    parser_balance = wallet_subparsers.add_parser("balance", help="print the amount owned by a key")
+    parser_balance.add_argument("--key", default=DEFAULT_KEY_PATH, help="DER encoded private key")
+    parser_balance.set_defaults(func=wallet_balance)
+
+    parser_migrate = subparsers.add_parser("migrate", help="bring the database to the current layout")
+    parser_migrate.set_defaults(func=migrate_database)
+
+    parser_snapshot = subparsers.add_parser("snapshot", help="export or import the unspent outputs")
+    snapshot_subparsers = parser_snapshot.add_subparsers(dest="snapshot_command")
+    snapshot_subparsers.required = True
+    parser_export = snapshot_subparsers.add_parser("export", help="write a snapshot and print its digest")
+    parser_export.add_argument("filename")
+    parser_export.add_argument("--height", type=int, default=None, help="height of the snapshot block, the head by default")
+    parser_export.set_defaults(func=snapshot_export)
+    parser_import = snapshot_subparsers.add_parser("import", help="load a snapshot into an empty database")
+    parser_import.add_argument("filename")
+    parser_import.add_argument("--sha256", default=None, help="digest published by a trusted node")
+    parser_import.set_defaults(func=snapshot_import)
+
+    parser_audit = subparsers.add_parser("audit", help="re-verify the stored main chain")
+    parser_audit.add_argument("--processes", type=int, default=os.cpu_count())
+    parser_audit.set_defaults(func=audit)
+
+    parser_bench = subparsers.add_parser("bench", help="benchmark block serialization")
+    parser_bench.add_argument("--transactions", type=int, default=1000)
+    parser_bench.add_argument("--rounds", type=int, default=10)
+    parser_bench.set_defaults(func=bench)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,55 +1,47 @@
-import numpy as np
 import multiprocessing as mp
+import random
 from datetime import datetime
 from .wallet import Wallet
-from ..common.settings import CONFIG
-from ..blockchain import Block, Transaction, CoinBase
+from ..blockchain import Block, CoinBase
+from ..blockchain.block import hash_value
 
 
 nounce_uplimit = int("F"*8, 16)
 block_size = 1000
 
 
-class TemperalBlock(Block):
-    def __init__(self, address):
-        self.data.append(Coinbase(address))
-
-    def update_nounce(self, nounce):
-        self._nounce = nounce
-        self._hash = None
-
-    def update_timestamp(self):
-        self._timestamp = datetime.now().timestamp()
-        self._hash = None
-
-    def update_parent(self, parent):
-        self._parent = parent
-        self._hash = None
-
-    def insert_transaction(self, transaction: Transaction):
-        transaction.bind(self._chain)
-        self.data[0].trx_out.add_fee(transaction.fee)
-        self.data.append(transaction)
-        self._hash = None
-
-
 class Miner(mp.Process):
+    """
+    Searches for blocks paying the wallet and puts the serialized ones it finds
+    on ``queue``, for the parent process to append.
+    """
     def __init__(self, wallet: Wallet, queue):
+        super(Miner, self).__init__()
         self.wallet = wallet
         self.queue = queue
-        self.transactions_cache = []
-        self.block = TemperalBlock(
-            address=CONFIG['miner']['address'],
-            parent=self.wallet.head,
+
+    def new_block(self) -> Block:
+        parent = self.wallet.head
+        return Block(
+            parent=parent,
             nounce=0,
             timestamp=int(datetime.now().timestamp()),
-            data=[],
+            data=[CoinBase(self.wallet.address, self.wallet.height_of(parent) + 1)],
         )
 
-    def run(self):
-        for nounce in np.random.randint(0, nounce_uplimit, block_size):
-            self.block.update_nounce(nounce)
-            if self.block.hash < self.wallet.current_hardness:
+    def search(self, block: Block, hardness: int) -> bool:
+        """
+        Try ``block_size`` random nounces, leaving ``block`` with the one found.
+        """
+        for _ in range(block_size):
+            block.nounce = random.randint(0, nounce_uplimit)
+            block._hash = None
+            if hash_value(block.hash) < hardness:
                 return True
-        self.block.update_timestamp()
-        self.block.update_parent(self.wallet.blockchain.head)
+        return False
+
+    def run(self):
+        while True:
+            block = self.new_block()
+            if self.search(block, self.wallet.hardness_at(block.parent)):
+                self.queue.put(block.serialize())
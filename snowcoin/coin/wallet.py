@@ -1,10 +1,7 @@
-import Pyro4
 from ..encryption.keys import KeyPair
 from ..blockchain import BlockChain, Block
 
 
-@Pyro4.expose
-@Pyro4.behavior(instance_mode="single")
 class Wallet(BlockChain):
     def __init__(self, keys: KeyPair):
         self.keys = keys
@@ -20,7 +17,7 @@ class Wallet(BlockChain):
         if self._money is None:
             money = []
             for ot in self.open_transactions:
-                trx_out = self[ot.block_hash][ot.transaction_hash].trx_out[ot.n]
+                trx_out = self.get_output(ot.block_hash, ot.transaction_hash, ot.n)
                 if trx_out.address == self.address:
                     money.append(ot)
             self._money = money
@@ -29,11 +26,18 @@ class Wallet(BlockChain):
     def amount(self) -> float:
         amount = 0.0
         for ot in self.money:
-            amount += self[ot.block_hash][ot.transaction_hash].trx_out[ot.n].amount
+            amount += self.get_output(ot.block_hash, ot.transaction_hash, ot.n).amount
         return amount
 
 
-if __name__ == '__main__':
+def serve():
+    import Pyro4
+    Pyro4.behavior(instance_mode="single")(Wallet)
+    Pyro4.expose(Wallet)
     Pyro4.Daemon.serveSimple({
         Wallet: 'snowcoin.wallet',
     })
+
+
+if __name__ == '__main__':
+    serve()
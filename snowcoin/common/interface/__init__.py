@@ -1,2 +1,2 @@
 from .hashable import Hashable
-from .serialize import Serializable, SerializableAttribute
+from .serialize import Serializable, SerializableAttribute, u8, u32, u64, varint
@@ -7,6 +7,31 @@ from typing import Sequence, List, Tuple, NamedTuple
 BYTES_ORDER = "<"
 
 
+class FixedInt(int):
+    """
+    Annotation for an int stored in a fixed number of bytes, given by ``fmt``.
+    """
+    fmt = None
+
+
+class u8(FixedInt):
+    fmt = "B"
+
+
+class u32(FixedInt):
+    fmt = "L"
+
+
+class u64(FixedInt):
+    fmt = "Q"
+
+
+class varint(int):
+    """
+    Annotation for a non-negative int stored in 7 bits per byte, small values take one byte.
+    """
+
+
 class SerializableAttribute:
     __slots__ = ['name', 'type_', 'readonly', 'serializer']
     def __init__(self, name, type_, readonly=False):
@@ -28,11 +53,14 @@ class SerializableAttribute:
 
 class SerializableMeta(type):
     def __new__(cls, name, parent, members):
-        mappings = []
+        mappings = {}
+        for base in parent:
+            mappings.update(getattr(base, 'mappings', []))
         for member, attribute in members.items():
             if isinstance(attribute, SerializableAttribute):
-                mappings.append((member, attribute.serializer))
-        members['mappings'] = sorted(mappings)
+                mappings[member] = attribute.serializer
+        mappings = sorted(mappings.items(), key=lambda item: item[0])
+        members['mappings'] = mappings
         init_func = members.get('__init__')
         def init(self, *args, **kwargs):
             for key, _ in mappings:
@@ -66,21 +94,38 @@ class BasicSerializer(Serializer):
         return value, buffer[size:]
 
 
+class VarIntSerializer(Serializer):
+    def serialize(self, value):
+        if value < 0:
+            raise ValueError("varint can not be negative")
+        data = bytearray()
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+        data.append(value)
+        return bytes(data)
+
+    def deserialize(self, buffer):
+        value = 0
+        shift = 0
+        for i, byte in enumerate(buffer):
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, buffer[i + 1:]
+            shift += 7
+        raise ValueError("buffer ends inside a varint")
+
+
+LENGTH_SERIALIZER = VarIntSerializer()
+
+
 class BytesSerializer(Serializer):
     def serialize(self, value):
-        n = len(value)
-        fmt = "{}L{}s".format(BYTES_ORDER, n)
-        return struct.pack(fmt, n, value)
+        return LENGTH_SERIALIZER.serialize(len(value)) + value
 
     def deserialize(self, buffer):
-        fmt = "{}L".format(BYTES_ORDER)
-        size = struct.calcsize(fmt)
-        n = struct.unpack(fmt, buffer[:size])[0]
-        buffer = buffer[size:]
-        fmt = "{}{}s".format(BYTES_ORDER, n)
-        size = struct.calcsize(fmt)
-        value, buffer = struct.unpack(fmt, buffer[:size])[0], buffer[size:]
-        return value, buffer
+        n, buffer = LENGTH_SERIALIZER.deserialize(buffer)
+        return buffer[:n], buffer[n:]
 
 
 class SequenceSerializer(Serializer):
@@ -89,30 +134,32 @@ class SequenceSerializer(Serializer):
         float: "d",
     }
     def __init__(self, container_type, element_type):
-        if not issubclass(container_type, (List, Tuple, NamedTuple)):
+        if not issubclass(container_type, (list, tuple)):
             raise TypeError("Can only serialize list/tuple/namedtuple type")
         if not issubclass(element_type, (int, float, bytes, Serializable)):
             raise TypeError("Can only serialize int/float/bytes/Serializable type")
         self.container_type = container_type
         self.element_type = element_type
+        if issubclass(element_type, FixedInt):
+            self.fmt = element_type.fmt
+        else:
+            self.fmt = self.type_mapping.get(element_type)
 
     def serialize(self, value: Sequence) -> bytes:
         n = len(value)
-        if self.element_type in self.type_mapping:
-            fmt = "{}L{}{}".format(BYTES_ORDER, n, self.type_mapping[self.element_type])
-            return struct.pack(fmt, n, *value)
+        if self.fmt is not None:
+            fmt = "{}{}{}".format(BYTES_ORDER, n, self.fmt)
+            return LENGTH_SERIALIZER.serialize(n) + struct.pack(fmt, *value)
         else:
             serializer = get_serializer(self.element_type)
             data = [serializer.serialize(item) for item in value]
-            data.insert(0, struct.pack("{}L".format(BYTES_ORDER), n))
+            data.insert(0, LENGTH_SERIALIZER.serialize(n))
             return b"".join(data)
 
     def deserialize(self, buffer: bytes) -> Sequence:
-        fmt = "{}L".format(BYTES_ORDER)
-        n = struct.unpack(fmt, buffer[:struct.calcsize(fmt)])[0]
-        buffer = buffer[struct.calcsize(fmt):]
-        if self.element_type in self.type_mapping:
-            fmt = "{}{}{}".format(BYTES_ORDER, n, self.type_mapping[self.element_type])
+        n, buffer = LENGTH_SERIALIZER.deserialize(buffer)
+        if self.fmt is not None:
+            fmt = "{}{}{}".format(BYTES_ORDER, n, self.fmt)
             data = self.container_type(struct.unpack(fmt, buffer[:struct.calcsize(fmt)]))
             buffer = buffer[struct.calcsize(fmt):]
             return data, buffer
@@ -169,15 +216,18 @@ class Serializable(metaclass=SerializableMeta):
 
 
 def get_serializer(objtype) -> Serializer:
-    if issubclass(objtype, int):
+    if getattr(objtype, "__origin__", None) in (list, List):
+        element_type = objtype.__args__[0]
+        return SequenceSerializer(list, element_type)
+    elif issubclass(objtype, varint):
+        return VarIntSerializer()
+    elif issubclass(objtype, FixedInt):
+        return BasicSerializer(objtype.fmt)
+    elif issubclass(objtype, int):
         return BasicSerializer("L")
     elif issubclass(objtype, float):
         return BasicSerializer("d")
     elif issubclass(objtype, bytes):
         return BytesSerializer()
-    elif issubclass(objtype, Sequence):
-        element_type = objtype.__args__[0]
-        container_type = objtype.__orig_bases__[0]
-        return SequenceSerializer(container_type, element_type)
     elif issubclass(objtype, Serializable):
         return CustomSerializer(objtype)
@@ -6,8 +6,11 @@ WORKSPACE = os.path.expanduser('~/.snowcoin/')
 CONFIG_PATH = os.path.join(WORKSPACE, 'config.ini')
 
 
+__config = None
+
+
 def create_config():
-    os.mkdir(WORKSPACE)
+    os.makedirs(WORKSPACE, exist_ok=True)
     config = ConfigParser()
     config['mongodb'] = {
         'host': 'localhost',
@@ -26,12 +29,20 @@ def create_config():
 
 
 def get_config():
-    if not os.path.exists(CONFIG_PATH):
-        config = create_config()
-    else:
-        config = ConfigParser()
-        config.read(CONFIG_PATH)
-    return config
-
-
-CONFIG = get_config()
+    """
+    Read the config the first time it is needed, creating it if missing.
+    """
+    global __config
+    if __config is None:
+        if not os.path.exists(CONFIG_PATH):
+            __config = create_config()
+        else:
+            __config = ConfigParser()
+            __config.read(CONFIG_PATH)
+    return __config
+
+
+def __getattr__(name):
+    if name == 'CONFIG':
+        return get_config()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
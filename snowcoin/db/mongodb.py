@@ -1,15 +1,18 @@
-from pymongo import MongoClient
-from pymongo.database import Database
-from ..common.settings import CONFIG
+from typing import TYPE_CHECKING
+from ..common.settings import get_config
+
+if TYPE_CHECKING:
+    from pymongo.database import Database
 
 
 __mongo = None
 
 
-def get_mongo() -> Database:
+def get_mongo() -> 'Database':
     global __mongo
     if __mongo is None:
-        config = CONFIG['mongodb']
+        from pymongo import MongoClient
+        config = get_config()['mongodb']
         client = MongoClient(host=config['host'], port=config.getint('port'))
         __mongo = client[config['database']]
     return __mongo
@@ -1,13 +1,17 @@
-from redis import Redis
-from ..common.settings import CONFIG
+from typing import TYPE_CHECKING
+from ..common.settings import get_config
+
+if TYPE_CHECKING:
+    from redis import Redis
 
 
 __redis = None
 
-def get_redis() -> Redis:
+def get_redis() -> 'Redis':
     global __redis
     if __redis is None:
-        config = CONFIG['redis']
+        from redis import Redis
+        config = get_config()['redis']
         __redis = Redis(
             host=config['host'],
             port=config.getint('port'),
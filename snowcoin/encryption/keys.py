@@ -1,20 +1,20 @@
-from Crypto.PublicKey import RSA
-from Crypto.Hash import SHA256, RIPEMD160
 from base64 import b64encode
 from typing import List
 
 
 def key2address(public_key):
+    from Crypto.Hash import SHA256, RIPEMD160
     x = SHA256.new(public_key).digest()
     x = RIPEMD160.new(x).digest()
     p = SHA256.new(x).digest()
     p = SHA256.new(p).digest()[:4]
     x = b"".join([x, p])
-    return b64encode(x).encode()
+    return b64encode(x)
 
 
 class KeyPair:
     def __init__(self, private_key, passphrase=None):
+        from Crypto.PublicKey import RSA
         self._key = RSA.importKey(private_key, passphrase)
         self._public_key = self._key.publickey().exportKey('DER')
         self._address = key2address(self.public_key)
@@ -32,6 +32,7 @@ class KeyPair:
 
     @classmethod
     def new(cls):
+        from Crypto.PublicKey import RSA
         key = RSA.generate(2048)
-        return cls(key)
+        return cls(key.exportKey('DER'))
     
@@ -1,9 +1,7 @@
-from Crypto.Signature import PKCS1_PSS
-from Crypto.Hash import SHA
-from Crypto.PublicKey import RSA
-
-
 def sign(msg, private_key):
+    from Crypto.Signature import PKCS1_PSS
+    from Crypto.Hash import SHA
+    from Crypto.PublicKey import RSA
     key = RSA.importKey(private_key)
     h = SHA.new(msg)
     signer = PKCS1_PSS.new(key)
@@ -12,6 +10,9 @@ def sign(msg, private_key):
 
 
 def verify(msg, signature, public_key):
+    from Crypto.Signature import PKCS1_PSS
+    from Crypto.Hash import SHA
+    from Crypto.PublicKey import RSA
     key = RSA.importKey(public_key)
     h = SHA.new(msg)
     verifier = PKCS1_PSS.new(key)
@@ -0,0 +1,72 @@
+import copy
+import functools
+try:
+    import fakeredis
+    from fakeredis.commands_mixins.generic_mixin import GenericCommandsMixin
+except ImportError:
+    fakeredis = None
+from snowcoin.db import redis_
+from snowcoin.blockchain import Block, BlockChain
+from snowcoin.blockchain.block import hash_value
+from snowcoin.blockchain.transaction import Transaction, TransactionIn, TransactionOut
+
+
+BLOCK_INTERVAL = 6000
+
+
+if fakeredis is not None:
+    _copy = GenericCommandsMixin.copy
+
+    @functools.wraps(_copy)
+    def _deep_copy(self, key, newkey, *args):
+        # fakeredis leaves the keys of a COPY sharing one value, Redis gives the new key its own.
+        copied = _copy(self, key, newkey, *args)
+        if copied:
+            newkey.value = copy.deepcopy(key.value)
+        return copied
+
+    GenericCommandsMixin.copy = _deep_copy
+
+
+def new_blockchain() -> BlockChain:
+    """
+    A BlockChain with only the gensis block, on an in memory redis.
+    """
+    setattr(redis_, "__redis", fakeredis.FakeRedis())
+    blockchain = BlockChain()
+    blockchain.initialize()
+    return blockchain
+
+
+def coinbase(address: bytes, height: int, amount: float = 1.0) -> Transaction:
+    trx_in = TransactionIn(block_hash=b"", transaction_hash=b"", n=height, public_key=b"", signature=b"")
+    return Transaction(trx_in=[trx_in], trx_out=[TransactionOut(address=address, amount=amount)])
+
+
+def spend(block_hash: bytes, transaction_hash: bytes, n: int, address: bytes, amount: float) -> Transaction:
+    trx_in = TransactionIn(block_hash=block_hash, transaction_hash=transaction_hash, n=n, public_key=b"", signature=b"")
+    return Transaction(trx_in=[trx_in], trx_out=[TransactionOut(address=address, amount=amount)])
+
+
+def signed_spend(keys, private_key, block_hash, transaction_hash, n, address, amount) -> Transaction:
+    from snowcoin.encryption.signature import sign
+    transaction = spend(block_hash, transaction_hash, n, address, amount)
+    trx_in = transaction.trx_in[0]
+    trx_in.public_key = keys.public_key
+    trx_in.signature = sign(transaction_hash, private_key)
+    return transaction
+
+
+def mine(blockchain: BlockChain, parent: bytes, data, interval: int = BLOCK_INTERVAL) -> Block:
+    """
+    A block on ``parent`` satisfying its hardness. Blocks are spaced far enough
+    apart by default that the hardness stays at its maximum.
+    """
+    hardness = blockchain.hardness_at(parent)
+    timestamp = blockchain[parent].timestamp + interval
+    nounce = 0
+    while True:
+        block = Block(parent=parent, nounce=nounce, timestamp=timestamp, data=data)
+        if hash_value(block.hash) < hardness:
+            return block
+        nounce += 1
@@ -0,0 +1,91 @@
+import random
+import unittest
+from unittest import mock
+from helpers import fakeredis, new_blockchain, coinbase, signed_spend, mine
+from snowcoin.blockchain import audit, chain
+from snowcoin.blockchain.chain import block_key, compute_hardness
+
+
+WINDOW = 5
+
+
+class HardnessScheduleTestCast(unittest.TestCase):
+    def test_compute_hardness(self):
+        rand = random.Random(0)
+        hashes = [rand.getrandbits(256).to_bytes(32, "little") for _ in range(30)]
+        timestamps = [0]
+        for _ in hashes[1:]:
+            # Not sorted, the window has to find its oldest and newest timestamps.
+            timestamps.append(timestamps[-1] + rand.randint(-200, 600))
+        with mock.patch.object(audit, "HARDNESS_WINDOW", WINDOW):
+            schedule = list(audit.hardness_schedule(hashes, timestamps))
+        expected = [
+            compute_hardness(hashes[max(0, i - WINDOW + 1):i + 1], timestamps[max(0, i - WINDOW + 1):i + 1])
+            for i in range(len(hashes) - 1)
+        ]
+        self.assertEqual(schedule, expected)
+        self.assertTrue(any(hardness < audit.MAX_HARDNESS for hardness in schedule))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class AuditTestCast(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(chain, HARDNESS_WINDOW=WINDOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.multiple(audit, HARDNESS_WINDOW=WINDOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.chain = new_blockchain()
+        rand = random.Random(0)
+        for height in range(1, 12):
+            block = mine(self.chain, self.chain.head, [coinbase(b"a", height)], interval=rand.randint(100, 1200))
+            self.chain.append(block)
+        self.hashes = self.chain.list_blocks()
+
+    def test_hardness_schedule(self):
+        timestamps = [self.chain[h].timestamp for h in self.hashes]
+        schedule = list(audit.hardness_schedule(self.hashes, timestamps))
+        self.assertEqual(schedule, [self.chain.hardness_at(h) for h in self.hashes[:-1]])
+        self.assertTrue(any(hardness < audit.MAX_HARDNESS for hardness in schedule))
+
+    def test_clean(self):
+        self.assertEqual(list(audit.audit(self.chain, processes=2, shard_size=4)), [])
+
+    def test_truncated(self):
+        key = block_key(self.hashes[5])
+        self.chain._redis.set(key, self.chain._redis.get(key)[:-40])
+        start, issues, timestamps = audit._audit_shard((4, self.hashes[3], self.hashes[4:8]))
+        self.assertEqual(start, 4)
+        self.assertEqual([(issue.height, issue.block_hash) for issue in issues], [(5, self.hashes[5])])
+        self.assertTrue(issues[0].message.startswith("cannot be decoded"))
+        self.assertIsNone(timestamps[1])
+
+        issues = list(audit.audit(self.chain, processes=2, shard_size=4))
+        self.assertEqual([issue.height for issue in issues], [5, None])
+
+
+    def test_owner(self):
+        from Crypto.PublicKey import RSA
+        from snowcoin.encryption.keys import KeyPair
+        owner, thief = [RSA.generate(1024).exportKey('DER') for _ in range(2)]
+        height = len(self.chain)
+        a = mine(self.chain, self.chain.head, [coinbase(KeyPair(owner).address, height)])
+        self.chain.append(a)
+        spent = a.data[0].hash
+        b = mine(self.chain, a.hash, [coinbase(b"a", height + 1), signed_spend(KeyPair(owner), owner, a.hash, spent, 0, b"b", 1.0)])
+        self.chain.append(b)
+        self.assertEqual(list(audit.audit(self.chain, processes=2, shard_size=4)), [])
+
+        # Signed by a key that does not own the output, as append would never store it.
+        forged = mine(self.chain, a.hash, [coinbase(b"a", height + 1), signed_spend(KeyPair(thief), thief, a.hash, spent, 0, b"b", 1.0)])
+        self.chain._redis.set(block_key(forged.hash), forged.serialize())
+        self.chain._redis.lset("hashes", height + 1, forged.hash)
+        issues = list(audit.audit(self.chain, processes=2, shard_size=4))
+        self.assertEqual([issue.height for issue in issues], [height + 1])
+        self.assertTrue(issues[0].message.startswith("output spent by another key"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import os
+from snowcoin.blockchain.bloom import BloomFilter
+
+
+class BloomFilterTestCast(unittest.TestCase):
+    def setUp(self):
+        self.items = [os.urandom(32) for _ in range(100)]
+        self.bloom = BloomFilter.from_items(self.items)
+
+    def test_contains(self):
+        for item in self.items:
+            self.assertIn(item, self.bloom)
+
+    def test_false_positive_rate(self):
+        false_positives = sum(os.urandom(32) in self.bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_add(self):
+        item = b"address"
+        bloom = BloomFilter.new(1)
+        self.assertNotIn(item, bloom)
+        bloom.add(item)
+        self.assertIn(item, bloom)
+
+    def test_from_items(self):
+        bloom = BloomFilter.new(len(self.items))
+        for item in self.items:
+            bloom.add(item)
+        self.assertEqual(bloom.bits, self.bloom.bits)
+
+    def test_recover(self):
+        bloom = BloomFilter.deserialize(self.bloom.serialize())
+        self.assertEqual(bloom.n_hashes, self.bloom.n_hashes)
+        for item in self.items:
+            self.assertIn(item, bloom)
+
+
+if __name__ == '__main__':
+    unittest.main()
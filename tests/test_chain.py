@@ -0,0 +1,203 @@
+import unittest
+from helpers import fakeredis, new_blockchain, coinbase, spend, signed_spend, mine
+from snowcoin.blockchain.chain import outpoint, undo_key, block_key, filter_key, block_filter
+from snowcoin.blockchain.transaction import Transaction, TransactionOut
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class BlockChainTestCast(unittest.TestCase):
+    def setUp(self):
+        self.chain = new_blockchain()
+        self.gensis = self.chain.head
+
+    def append(self, parent, data):
+        block = mine(self.chain, parent, data)
+        self.chain.append(block)
+        return block
+
+    def unspent(self):
+        return {ot.outpoint for ot in self.chain.open_transactions}
+
+    def test_extend(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        a2 = self.append(a1.hash, [coinbase(b"a2", 2)])
+        self.assertEqual(len(self.chain), 3)
+        self.assertEqual(self.chain.head, a2.hash)
+        self.assertEqual(self.unspent(), {outpoint(a1.data[0].hash, 0), outpoint(a2.data[0].hash, 0)})
+
+    def test_same_address(self):
+        a1 = self.append(self.gensis, [coinbase(b"a", 1)])
+        a2 = self.append(a1.hash, [coinbase(b"a", 2)])
+        self.assertEqual(self.chain.head, a2.hash)
+        self.assertEqual(self.unspent(), {outpoint(a1.data[0].hash, 0), outpoint(a2.data[0].hash, 0)})
+
+    def test_coinbase_height(self):
+        a1 = self.append(self.gensis, [coinbase(b"a", 1)])
+        for data in [[coinbase(b"a", 1)], [coinbase(b"a", 3)], [coinbase(b"a", 2), coinbase(b"b", 2)]]:
+            block = mine(self.chain, a1.hash, data)
+            with self.assertRaises(RuntimeError):
+                self.chain.append(block)
+        self.assertEqual(self.chain.head, a1.hash)
+
+    def test_output_index(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        self.append(a1.hash, [coinbase(b"a2", 2)])
+        b2 = mine(self.chain, a1.hash, [coinbase(b"b2", 2), spend(a1.hash, a1.data[0].hash, 2 ** 32, b"b2", 1.0)])
+        with self.assertRaises(RuntimeError):
+            self.chain.append(b2)
+        self.assertFalse(self.chain._redis.exists(block_key(b2.hash)))
+        self.assertFalse(self.chain.has_block(b2.hash))
+
+    def test_side_branch(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        b1 = self.append(self.gensis, [coinbase(b"b1", 1)])
+        self.assertEqual(self.chain.head, a1.hash)
+        self.assertTrue(self.chain.has_block(b1.hash))
+        self.assertFalse(self.chain.is_main_chain(b1.hash))
+
+    def test_reorganize(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        b1 = self.append(self.gensis, [coinbase(b"b1", 1)])
+        b2 = self.append(b1.hash, [coinbase(b"b2", 2)])
+        self.assertEqual(self.chain.list_blocks(), [self.gensis, b1.hash, b2.hash])
+        self.assertEqual(self.unspent(), {outpoint(b1.data[0].hash, 0), outpoint(b2.data[0].hash, 0)})
+        self.assertIsNone(self.chain._redis.get(undo_key(a1.hash)))
+
+        a2 = self.append(a1.hash, [coinbase(b"a2", 2)])
+        a3 = self.append(a2.hash, [coinbase(b"a3", 3)])
+        self.assertEqual(self.chain.list_blocks(), [self.gensis, a1.hash, a2.hash, a3.hash])
+        self.assertEqual(self.unspent(), {outpoint(block.data[0].hash, 0) for block in (a1, a2, a3)})
+
+    def test_invalid_branch_rolls_back(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        a2 = self.append(a1.hash, [coinbase(b"a2", 2)])
+        before = self.unspent()
+        b1 = self.append(self.gensis, [coinbase(b"b1", 1)])
+        b2 = self.append(b1.hash, [coinbase(b"b2", 2)])
+        b3 = mine(self.chain, b2.hash, [coinbase(b"b3", 3), spend(b"\0" * 32, b"\0" * 32, 0, b"b3", 1.0)])
+        with self.assertRaises(RuntimeError):
+            self.chain.append(b3)
+        self.assertEqual(self.chain.list_blocks(), [self.gensis, a1.hash, a2.hash])
+        self.assertEqual(self.unspent(), before)
+        self.assertFalse(self.chain.has_block(b3.hash))
+
+    def test_hardness_at(self):
+        a1 = self.append(self.gensis, [coinbase(b"a1", 1)])
+        a2 = self.append(a1.hash, [coinbase(b"a2", 2)])
+        # Timestamps are read from TIMESTAMP when present, and from the blocks otherwise
+        self.chain._redis.hset("TIMESTAMP", mapping={a1.hash: 10, a2.hash: 20})
+        hardness = self.chain.hardness_at(a2.hash)
+        self.chain._redis.delete("TIMESTAMP")
+        self.assertNotEqual(self.chain.hardness_at(a2.hash), hardness)
+        self.assertEqual(self.chain.hardness_at(a2.hash), self.chain.current_hardness)
+
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class DoubleSpendTestCast(unittest.TestCase):
+    def setUp(self):
+        from Crypto.PublicKey import RSA
+        from snowcoin.encryption.keys import KeyPair
+        self.private_key = RSA.generate(1024).exportKey('DER')
+        self.keys = KeyPair(self.private_key)
+        self.chain = new_blockchain()
+        self.a1 = mine(self.chain, self.chain.head, [coinbase(self.keys.address, 1, 10.0)])
+        self.chain.append(self.a1)
+
+    def spend(self, address):
+        return signed_spend(self.keys, self.private_key, self.a1.hash, self.a1.data[0].hash, 0, address, 10.0)
+
+    def assertRejected(self, parent, data):
+        head = self.chain.head
+        block = mine(self.chain, parent, data)
+        with self.assertRaises(RuntimeError):
+            self.chain.append(block)
+        self.assertEqual(self.chain.head, head)
+
+    def test_single_spend(self):
+        block = mine(self.chain, self.a1.hash, [coinbase(b"z", 2), self.spend(b"x")])
+        self.chain.append(block)
+        self.assertEqual(self.chain.head, block.hash)
+
+    def test_two_transactions(self):
+        self.assertRejected(self.a1.hash, [coinbase(b"z", 2), self.spend(b"x"), self.spend(b"y")])
+
+    def test_one_transaction(self):
+        trx_in = self.spend(b"x").trx_in[0]
+        transaction = Transaction(trx_in=[trx_in, trx_in], trx_out=[TransactionOut(address=b"x", amount=20.0)])
+        self.assertRejected(self.a1.hash, [coinbase(b"z", 2), transaction])
+
+    def test_reorganize(self):
+        a2 = mine(self.chain, self.a1.hash, [coinbase(b"z", 2)])
+        self.chain.append(a2)
+        b2 = mine(self.chain, self.a1.hash, [coinbase(b"z", 2), self.spend(b"x"), self.spend(b"y")])
+        self.chain.append(b2)
+        self.assertEqual(self.chain.head, a2.hash)
+        self.assertRejected(b2.hash, [coinbase(b"z", 3)])
+        self.assertFalse(self.chain.has_block(b2.hash))
+        self.assertEqual(self.unspent(), {outpoint(self.a1.data[0].hash, 0), outpoint(a2.data[0].hash, 0)})
+
+    def unspent(self):
+        return {ot.outpoint for ot in self.chain.open_transactions}
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class AddressHistoryTestCast(unittest.TestCase):
+    def setUp(self):
+        from Crypto.PublicKey import RSA
+        from snowcoin.encryption.keys import KeyPair
+        private_key = RSA.generate(1024).exportKey('DER')
+        self.address = KeyPair(private_key).address
+        self.chain = new_blockchain()
+        self.blocks = []
+        self.append([coinbase(self.address, 1)])
+        self.append([coinbase(b"x", 2)])
+        a1 = self.blocks[0]
+        transaction = signed_spend(KeyPair(private_key), private_key, a1.hash, a1.data[0].hash, 0, b"y", 1.0)
+        self.append([coinbase(b"z", 3), transaction])
+        self.append([coinbase(b"z", 4)])
+
+    def append(self, data):
+        block = mine(self.chain, self.chain.head, data)
+        self.chain.append(block)
+        self.blocks.append(block)
+
+    def heights(self, address):
+        return [height for height, _ in self.chain.address_history(address)]
+
+    def test_block_filter(self):
+        a1, a3 = self.blocks[0], self.blocks[2]
+        bloom = block_filter(a3)
+        self.assertIn(b"y", bloom)
+        self.assertIn(b"z", bloom)
+        self.assertIn(self.address, bloom)
+        self.assertNotIn(self.address, block_filter(self.blocks[3]))
+        self.assertEqual(self.chain._redis.get(filter_key(a3.hash)), bloom.serialize())
+
+    def test_address_history(self):
+        self.assertEqual(self.heights(self.address), [1, 3])
+        self.assertEqual(self.heights(b"y"), [3])
+        self.assertEqual(self.heights(b"z"), [3, 4])
+        self.assertEqual(self.heights(b"unknown"), [])
+        history = self.chain.address_history(self.address)
+        self.assertEqual([block.hash for _, block in history], [self.blocks[0].hash, self.blocks[2].hash])
+
+    def test_without_filters(self):
+        for block in self.blocks:
+            self.chain._redis.delete(filter_key(block.hash))
+        self.assertEqual(self.heights(self.address), [1, 3])
+
+    def test_missing_block(self):
+        a2 = self.blocks[1]
+        self.chain._redis.delete(block_key(a2.hash), filter_key(a2.hash))
+        self.assertEqual(self.heights(self.address), [1, 3])
+        self.assertEqual(self.heights(b"x"), [])
+
+    def test_spend_below_snapshot(self):
+        a1 = self.blocks[0]
+        self.chain._redis.delete(block_key(a1.hash), filter_key(a1.hash))
+        self.assertEqual(self.heights(self.address), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import hashlib
-from snowcoin.blockchain.interface.hashable import Hashable
-from snowcoin.blockchain.interface.serialize import SerializableAttribute
+from snowcoin.common.interface.hashable import Hashable
+from snowcoin.common.interface.serialize import SerializableAttribute
 
 
 class HashableTestCast(unittest.TestCase):
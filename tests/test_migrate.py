@@ -0,0 +1,72 @@
+import struct
+import unittest
+from helpers import fakeredis, new_blockchain, coinbase, mine
+from snowcoin.blockchain.chain import OpenTransaction, block_key, filter_key
+from snowcoin.blockchain.migrate import migrate
+
+
+OLD_GENSIS_HASH = b'\x8d\x9d#K<!\x9b\x02t\xea\xdaC\x19.\x14_\x90\x9aA:n+\x04zR\x95o;5I\xad\xac'
+
+
+def old_open_transaction(ot: OpenTransaction) -> bytes:
+    """
+    ``ot`` as it was serialized with four byte lengths and indexes.
+    """
+    return b"".join([
+        struct.pack("<L", 32), ot.block_hash,
+        struct.pack("<L", ot.n),
+        struct.pack("<L", 32), ot.transaction_hash,
+    ])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class MigrateTestCast(unittest.TestCase):
+    def setUp(self):
+        self.chain = new_blockchain()
+        self.redis = self.chain._redis
+        for height in range(1, 4):
+            self.chain.append(mine(self.chain, self.chain.head, [coinbase(b"a", height)]))
+        self.hashes = self.chain.list_blocks()
+        self.unspent = list(self.chain.open_transactions)
+
+    def dump(self):
+        return {key: self.redis.dump(key) for key in self.redis.keys()}
+
+    def assertRefused(self):
+        before = self.dump()
+        with self.assertRaises(RuntimeError):
+            migrate(self.chain)
+        self.assertEqual(self.dump(), before)
+
+    def test_filters(self):
+        for block_hash in self.hashes:
+            self.redis.delete(filter_key(block_hash))
+        self.assertEqual(dict(migrate(self.chain))["block filters"], len(self.hashes))
+        self.assertTrue(all(self.redis.exists(filter_key(h)) for h in self.hashes))
+        self.assertEqual(dict(migrate(self.chain))["block filters"], 0)
+
+    def test_old_layout(self):
+        for block_hash in self.hashes:
+            self.redis.rename(block_key(block_hash), "BLOCK:{!r}".format(block_hash))
+            self.redis.delete(filter_key(block_hash))
+        self.assertRefused()
+
+    def test_old_open_transactions(self):
+        self.redis.delete("open_transactions")
+        self.redis.sadd("open_transactions", *[old_open_transaction(ot) for ot in self.unspent])
+        self.assertRefused()
+
+    def test_old_block(self):
+        key = block_key(self.hashes[2])
+        raw = self.redis.get(key)
+        # A four byte length in front of the parent hash, as the old encoding wrote it.
+        self.redis.set(key, struct.pack("<L", 32) + raw[1:])
+        self.assertRefused()
+
+    def test_old_blocks(self):
+        self.redis.lset("hashes", 0, OLD_GENSIS_HASH)
+        self.redis.rename(block_key(self.hashes[0]), "BLOCK:{!r}".format(OLD_GENSIS_HASH))
+        self.assertRefused()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from helpers import fakeredis, new_blockchain
+from snowcoin import cli
+from snowcoin.blockchain import Block, CoinBase, Transaction
+from snowcoin.coin.miner import Miner
+from snowcoin.coin.wallet import Wallet
+
+
+class CoinBaseTestCast(unittest.TestCase):
+    def test_hash(self):
+        transaction = CoinBase(b"address", 1)
+        data = Block(parent=b"0" * 32, nounce=0, timestamp=0, data=[transaction]).serialize()
+        self.assertEqual(Block.deserialize(data).data[0].hash, transaction.hash)
+
+    def test_height(self):
+        self.assertEqual(CoinBase(b"address", 1).coinbase_height, 1)
+        self.assertNotEqual(CoinBase(b"address", 1).hash, CoinBase(b"address", 2).hash)
+
+    def test_add_fee(self):
+        transaction = CoinBase(b"address", 1)
+        hash = transaction.hash
+        transaction.add_fee(1.5)
+        self.assertEqual(transaction.total_out, 11.5)
+        self.assertNotEqual(transaction.hash, hash)
+        self.assertEqual(Transaction.deserialize(transaction.serialize()).hash, transaction.hash)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class MinerTestCast(unittest.TestCase):
+    def setUp(self):
+        new_blockchain()
+        fd, self.key = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.key)
+        self.addCleanup(lambda: os.path.exists(self.key) and os.remove(self.key))
+        with redirect_stdout(io.StringIO()) as out:
+            cli.main(["wallet", "new", "--key", self.key])
+        self.address = out.getvalue().strip().encode()
+
+    def balance(self):
+        with redirect_stdout(io.StringIO()) as out:
+            cli.main(["wallet", "balance", "--key", self.key])
+        return float(out.getvalue())
+
+    def test_mine_and_balance(self):
+        wallet = Wallet(cli.load_keys(self.key))
+        self.assertEqual(wallet.address, self.address)
+        self.assertEqual(self.balance(), 0.0)
+        miner = Miner(wallet, None)
+        for amount in [10.0, 20.0]:
+            block = miner.new_block()
+            while not miner.search(block, wallet.hardness_at(block.parent)):
+                pass
+            wallet.append(Block.deserialize(block.serialize()))
+            self.assertEqual(wallet.head, block.hash)
+            self.assertEqual(self.balance(), amount)
+
+
+if __name__ == '__main__':
+    unittest.main()
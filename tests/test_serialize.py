@@ -1,5 +1,5 @@
 import unittest
-from snowcoin.blockchain.interface.serialize import *
+from snowcoin.common.interface.serialize import *
 
 
 class SerializerTestCast(unittest.TestCase):
@@ -62,6 +62,47 @@ class SerializerTestCast(unittest.TestCase):
         self.assertEqual(len(new_buff), 0)
         self.assertEqual(a, b)
 
+    def test_u64(self):
+        a = 2 ** 40 + 3
+        serializer = get_serializer(u64)
+        buff = serializer.serialize(a)
+        b, new_buff = serializer.deserialize(buff)
+        self.assertEqual(len(buff), 8)
+        self.assertEqual(len(new_buff), 0)
+        self.assertEqual(a, b)
+
+    def test_u8_overflow(self):
+        serializer = get_serializer(u8)
+        self.assertEqual(len(serializer.serialize(255)), 1)
+        with self.assertRaises(struct.error):
+            serializer.serialize(256)
+
+    def test_varint(self):
+        serializer = get_serializer(varint)
+        for a, size in [(0, 1), (127, 1), (128, 2), (2 ** 64, 10)]:
+            buff = serializer.serialize(a)
+            b, new_buff = serializer.deserialize(buff + b"rest")
+            self.assertEqual(len(buff), size)
+            self.assertEqual(new_buff, b"rest")
+            self.assertEqual(a, b)
+
+    def test_list_u32(self):
+        a = [1, 2, 2 ** 32 - 1]
+        serializer = get_serializer(List[u32])
+        buff = serializer.serialize(a)
+        b, new_buff = serializer.deserialize(buff)
+        self.assertEqual(len(buff), 1 + 3 * 4)
+        self.assertEqual(len(new_buff), 0)
+        self.assertListEqual(a, b)
+
+    def test_list_varint(self):
+        a = [1, 300, 2 ** 40]
+        serializer = get_serializer(List[varint])
+        buff = serializer.serialize(a)
+        b, new_buff = serializer.deserialize(buff)
+        self.assertEqual(len(new_buff), 0)
+        self.assertListEqual(a, b)
+
     def test_object(self):
         obj = self.B(m=[self.A(a=1, b=1.2)])
         buf = obj.serialize()
@@ -0,0 +1,145 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from helpers import fakeredis, new_blockchain, coinbase, signed_spend, mine
+from snowcoin.blockchain import chain, snapshot
+from snowcoin.blockchain.chain import outpoint
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class SnapshotTestCast(unittest.TestCase):
+    def setUp(self):
+        from Crypto.PublicKey import RSA
+        from snowcoin.encryption.keys import KeyPair
+        self.private_key = RSA.generate(1024).exportKey('DER')
+        self.keys = KeyPair(self.private_key)
+        # Keep only two blocks in the snapshot, so that spending the output
+        # of an older block has to go through COINS.
+        patcher = mock.patch.multiple(chain, HARDNESS_WINDOW=2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.multiple(snapshot, HARDNESS_WINDOW=2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.chain = new_blockchain()
+        self.blocks = []
+        parent = self.chain.head
+        for height, address in enumerate([self.keys.address, b"a2", b"a3"], 1):
+            block = mine(self.chain, parent, [coinbase(address, height)])
+            self.chain.append(block)
+            self.blocks.append(block)
+            parent = block.hash
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.filename)
+
+    def unspent(self, blockchain):
+        return {(ot.outpoint, ot.block_hash) for ot in blockchain.open_transactions}
+
+    def test_export_import_append(self):
+        unspent = self.unspent(self.chain)
+        hashes = self.chain.list_blocks()
+        digest = snapshot.export_snapshot(self.chain, self.filename)
+
+        imported = new_blockchain()
+        imported._redis.flushall()
+        self.assertEqual(snapshot.import_snapshot(imported, self.filename), digest)
+        self.assertEqual(imported.list_blocks(), hashes)
+        self.assertEqual(self.unspent(imported), unspent)
+        self.assertEqual(imported._redis.keys("snapshot:*"), [])
+
+        a1 = self.blocks[0]
+        self.assertFalse(imported._redis.exists(chain.block_key(a1.hash)))
+        transaction = signed_spend(self.keys, self.private_key, a1.hash, a1.data[0].hash, 0, b"b", 1.0)
+        block = mine(imported, imported.head, [coinbase(b"a4", 4), transaction])
+        imported.append(block)
+        self.assertEqual(imported.head, block.hash)
+        self.assertNotIn(outpoint(a1.data[0].hash, 0), {key for key, _ in self.unspent(imported)})
+
+    def test_reorganize_during_export(self):
+        hashes = self.chain.list_blocks()
+        a2, a3 = self.blocks[1], self.blocks[2]
+        ancestors = self.chain.ancestors
+        done = []
+
+        def reorganize(*args):
+            if done:
+                return ancestors(*args)
+            done.append(True)
+            # Replace a3 after the export has taken its copies.
+            b3 = mine(self.chain, a2.hash, [coinbase(b"b3", 3)])
+            self.chain.append(b3)
+            self.chain.append(mine(self.chain, b3.hash, [coinbase(b"b4", 4)]))
+            return ancestors(*args)
+
+        with mock.patch.object(self.chain, "ancestors", side_effect=reorganize):
+            snapshot.export_snapshot(self.chain, self.filename)
+        self.assertNotEqual(self.chain.list_blocks()[3], a3.hash)
+
+        imported = new_blockchain()
+        imported._redis.flushall()
+        snapshot.import_snapshot(imported, self.filename)
+        self.assertEqual(imported.list_blocks(), hashes)
+        self.assertEqual(self.chain._redis.keys("snapshot:*"), [])
+
+    def test_spend_stored_output(self):
+        a1 = self.blocks[0]
+        transaction = signed_spend(self.keys, self.private_key, a1.hash, a1.data[0].hash, 0, b"b", 1.0)
+        block = mine(self.chain, self.chain.head, [coinbase(b"a4", 4), transaction])
+        self.chain.append(block)
+        self.assertEqual(self.chain.head, block.hash)
+
+    def test_export_at_height(self):
+        snapshot.export_snapshot(self.chain, self.filename, height=1)
+        imported = new_blockchain()
+        imported._redis.flushall()
+        snapshot.import_snapshot(imported, self.filename)
+        a1 = self.blocks[0]
+        self.assertEqual(imported.head, a1.hash)
+        self.assertEqual(self.unspent(imported), {(outpoint(a1.data[0].hash, 0), a1.hash)})
+
+    def test_corrupted(self):
+        snapshot.export_snapshot(self.chain, self.filename)
+        with open(self.filename, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 1]))
+        imported = new_blockchain()
+        imported._redis.flushall()
+        with self.assertRaises(ValueError):
+            snapshot.import_snapshot(imported, self.filename)
+        self.assertEqual(imported._redis.keys(), [])
+
+
+    def test_expected_digest(self):
+        digest = snapshot.export_snapshot(self.chain, self.filename)
+        imported = new_blockchain()
+        imported._redis.flushall()
+        with self.assertRaises(ValueError):
+            snapshot.import_snapshot(imported, self.filename, "0" * 64)
+        self.assertEqual(imported._redis.keys(), [])
+        self.assertEqual(snapshot.import_snapshot(imported, self.filename, digest.upper()), digest)
+        self.assertEqual(imported.head, self.chain.head)
+
+    def test_cli(self):
+        from snowcoin import cli
+        with redirect_stdout(io.StringIO()) as out:
+            cli.main(["snapshot", "export", self.filename])
+        digest = out.getvalue().split()[-1]
+        imported = new_blockchain()
+        imported._redis.flushall()
+        with self.assertRaises(SystemExit):
+            cli.main(["snapshot", "import", self.filename, "--sha256", "0" * 64])
+        with redirect_stdout(io.StringIO()) as out:
+            cli.main(["snapshot", "import", self.filename, "--sha256", digest])
+        self.assertEqual(out.getvalue().split()[-1], digest)
+        self.assertEqual(imported.list_blocks(), self.chain.list_blocks())
+
+
+if __name__ == '__main__':
+    unittest.main()